@@ -0,0 +1,31 @@
+"""
+Solves every tic-tac-toe position and writes the optimal move for each board
+code to policy.bin, which tictactoe.minimax looks up instead of searching.
+
+Usage: python build_policy.py
+"""
+
+import tictactoe as ttt
+
+
+def main():
+    policy = bytearray([ttt.NO_MOVE]) * 3 ** 9
+
+    for code in range(3 ** 9):
+        board = ttt.decode(code)
+
+        # X moves first, so X has as many pieces as O or one more
+        if board.count(ttt.X) - board.count(ttt.O) not in (0, 1):
+            continue
+        if ttt.TERMINAL_TABLE[code]:
+            continue
+
+        policy[code] = ttt.minimax_id(board)
+
+    with open(ttt.POLICY_FILE, "wb") as f:
+        f.write(policy)
+    print(f"Wrote {ttt.POLICY_FILE}")
+
+
+if __name__ == "__main__":
+    main()
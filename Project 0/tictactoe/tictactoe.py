@@ -3,37 +3,107 @@ Tic Tac Toe Player
 """
 
 import math
-import copy
+import os
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Boards are also encoded as an integer code = sum(value(cell i) * 3 ** i),
+# with value 0 for EMPTY, 1 for X and 2 for O
+POW3 = [3 ** i for i in range(9)]
+CELL_VALUE = {EMPTY: 0, X: 1, O: 2}
+CELLS = (EMPTY, X, O)
+WINNERS = (None, X, O)
+
+# Bitboards of the 8 lines: bit 3 * i + j is set if the line holds cell (i, j)
+WIN_MASKS = [0o007, 0o070, 0o700, 0o111, 0o222, 0o444, 0o421, 0o124]
+
+# Transposition table: code -> (value, depth, flag, best_move),
+# value from the point of view of the player to move
+TT = {}
+EXACT = 0
+LOWERBOUND = 1
+UPPERBOUND = 2
+
+# Optimal move (cell index) for every code, written by build_policy.py;
+# NO_MOVE for terminal and unreachable boards
+POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "policy.bin")
+NO_MOVE = 255
+
+
+def has_line(mask):
+    """
+    Returns True if the bitboard holds three in a row.
+    """
+    for w in WIN_MASKS:
+        if mask & w == w:
+            return True
+    return False
+
+
+def build_tables():
+    """
+    Returns the (winner, terminal) tables for all 3 ** 9 codes: the cell value
+    of the winner (0 if none), and 1 if the game is over (0 otherwise).
+    """
+    winner_table = bytearray(3 ** 9)
+    terminal_table = bytearray(3 ** 9)
+    for code in range(3 ** 9):
+        x = 0
+        o = 0
+        rest = code
+        for i in range(9):
+            rest, value = divmod(rest, 3)
+            if value == CELL_VALUE[X]:
+                x |= 1 << i
+            elif value == CELL_VALUE[O]:
+                o |= 1 << i
+
+        if has_line(x):
+            winner_table[code] = CELL_VALUE[X]
+        elif has_line(o):
+            winner_table[code] = CELL_VALUE[O]
+        terminal_table[code] = winner_table[code] != 0 or (x | o) == 0o777
+    return bytes(winner_table), bytes(terminal_table)
+
+
+WINNER_TABLE, TERMINAL_TABLE = build_tables()
+
+
+def load_policy():
+    """
+    Returns the policy table from POLICY_FILE, or None if it has not been built.
+    """
+    try:
+        with open(POLICY_FILE, "rb") as f:
+            policy = f.read()
+    except FileNotFoundError:
+        return None
+
+    if len(policy) != 3 ** 9:
+        return None
+    return policy
+
+
+BEST_MOVE = load_policy()
+
 
 def initial_state():
     """
     Returns starting state of the board.
+
+    The board is a flat tuple of 9 cells in row-major order, so cell (i, j)
+    is board[3 * i + j].
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return (EMPTY,) * 9
 
 
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    count_x = 0
-    count_o = 0
-
-    for r in range(3):
-        for c in range(3):
-            if board[r][c] == X:
-                count_x += 1
-            elif board[r][c] == O:
-                count_o += 1
-    
-    if count_x == count_o:
+    if board.count(X) == board.count(O):
         return X
     else:
         return O
@@ -46,10 +116,9 @@ def actions(board):
 
     # (row, cell) is legal move if its position on the board is currently empty
     legal_actions = set()
-    for row in range(3):
-        for cell in range(3):
-            if board[row][cell] == EMPTY:
-                legal_actions.add((row, cell))
+    for i in range(9):
+        if board[i] == EMPTY:
+            legal_actions.add(divmod(i, 3))
 
     return legal_actions
     
@@ -58,110 +127,195 @@ def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
+    i = 3 * action[0] + action[1]
 
-    if board[action[0]][action[1]] is not EMPTY:
+    if board[i] is not EMPTY:
         raise Exception("Illegal aciton")
-    
-    new_board = copy.deepcopy(board)
-    new_board[action[0]][action[1]] = player(board)
 
-    return new_board
+    return board[:i] + (player(board),) + board[i + 1:]
 
 
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    for cur_player in [O, X]:
-        # Row
-        for i in range(3):
-            if board[i][0] == cur_player and board[i][1] == cur_player and board[i][2] == cur_player:
-                return cur_player
-
-        # Column
-        for i in range(3):
-            if board[0][i] == cur_player and board[1][i] == cur_player and board[2][i] == cur_player:
-                return cur_player
-
-        # Diagonal
-        if board[0][0] == cur_player and board[1][1] == cur_player and board[2][2] == cur_player:
-                return cur_player
-        elif board[0][2] == cur_player and board[1][1] == cur_player and board[2][0] == cur_player:
-                return cur_player
-
-    return None
+    return WINNERS[WINNER_TABLE[encode(board)]]
 
         
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    if winner(board) is not None:
-        return True
-
-    end = True
-    for r in range(3):
-        for c in range(3):
-            if board[r][c] == EMPTY:
-                end = False
-                break
-    
-    return end
+    return TERMINAL_TABLE[encode(board)] == 1
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    if winner(board) == X:
+    w = winner(board)
+    if w == X:
         return 1
-    elif winner(board) == O:
+    elif w == O:
         return -1
     else:
         return 0
 
 
+def encode(board):
+    """
+    Returns the integer code of the board.
+    """
+    code = 0
+    for i in range(9):
+        code += CELL_VALUE[board[i]] * POW3[i]
+    return code
+
+
+def decode(code):
+    """
+    Returns the board with the given integer code.
+    """
+    board = []
+    for i in range(9):
+        code, value = divmod(code, 3)
+        board.append(CELLS[value])
+    return tuple(board)
+
+
+def empty_cells(code):
+    """
+    Returns list of the empty cell indices of the board with the given code.
+    """
+    return [i for i in range(9) if code // POW3[i] % 3 == 0]
+
+
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
-    if terminal(board):
+    code = encode(board)
+    if TERMINAL_TABLE[code]:
         return None
-    
-    cur_player = player(board)
-
-    if cur_player == X:
-        v = - math.inf
-        for action in actions(board):
-            max_v = min_value(result(board, action))
-            if max_v > v:
-                optimal_move = action
-                v = max_v
-        return optimal_move
-
-    elif cur_player == O:
-        v = math.inf
-        for action in actions(board):
-            min_v = max_value(result(board, action))
-            if min_v < v:
-                optimal_move = action
-                v = min_v
-        return optimal_move
-
-
-def max_value(board):
-    if terminal(board):
-        return utility(board)
+
+    # Look the move up in the precomputed policy, searching only if it is missing
+    if BEST_MOVE is not None and BEST_MOVE[code] != NO_MOVE:
+        return divmod(BEST_MOVE[code], 3)
+    return divmod(minimax_id(board), 3)
+
+
+def minimax_id(board):
+    """
+    Returns the index of the optimal cell for the current player, found by
+    iterative deepening: each iteration searches the previous best move first.
+    """
+    code = encode(board)
+    piece = CELL_VALUE[player(board)]
+
+    best = None
+    for depth in range(1, len(empty_cells(code)) + 1):
+        best, v = ab_search(code, piece, depth, best)
+
+        # A win or loss within the horizon is already the exact value
+        if v != 0:
+            break
+    return best
+
+
+def ab_search(code, piece, depth, best_prev):
+    """
+    Searches the root position to the given depth, with `piece` (the cell
+    value of the player to move) to move, trying `best_prev` first.
+    Returns the (best_move, value) pair.
+    """
+    alpha = - math.inf
+    beta = math.inf
     v = - math.inf
-    for action in actions(board):
-        v = max(v, min_value(result(board, action)))
-    return v
+    for i in ordered_actions(empty_cells(code), best_prev):
+        child_v = - negamax(code + piece * POW3[i], 3 - piece, - beta, - alpha, depth - 1)
+        if child_v > v:
+            best = i
+            v = child_v
+        alpha = max(alpha, v)
+    return best, v
+
+
+def ordered_actions(legal_actions, first):
+    """
+    Returns the list of cell indices `legal_actions`, with `first` (if any)
+    moved to the front.
+    """
+    if first is not None:
+        legal_actions.remove(first)
+        legal_actions.insert(0, first)
+    return legal_actions
 
 
-def min_value(board):
-    if terminal(board):
-        return utility(board)
-    v = math.inf
-    for action in actions(board):
-        v = min(v, max_value(result(board, action)))
-    return v
\ No newline at end of file
+def tt_lookup(key, depth, alpha, beta):
+    """
+    Returns the cached (value, best_move) of a position. The value is None
+    unless the entry is deep enough and decides the (alpha, beta) window.
+    """
+    entry = TT.get(key)
+    if entry is None:
+        return None, None
+
+    value, entry_depth, flag, best = entry
+    if entry_depth < depth:
+        return None, best
+    if flag == EXACT:
+        return value, best
+    if flag == LOWERBOUND and value >= beta:
+        return value, best
+    if flag == UPPERBOUND and value <= alpha:
+        return value, best
+    return None, best
+
+
+def tt_store(key, depth, alpha, beta, value, best):
+    """
+    Caches value and best move of a position searched with window (alpha, beta).
+    """
+    if value <= alpha:
+        flag = UPPERBOUND
+    elif value >= beta:
+        flag = LOWERBOUND
+    else:
+        flag = EXACT
+    TT[key] = (value, depth, flag, best)
+
+
+def negamax(code, piece, alpha, beta, depth):
+    """
+    Returns the value of the board with the given code for the player to
+    move, whose cell value is `piece`: 1 if they can force a win, -1 if they
+    lose, 0 for a tie (or if the game is undecided after `depth` more moves).
+    Prunes branches outside the (alpha, beta) window.
+    """
+    # Only the player who just moved can have completed a line
+    if WINNER_TABLE[code]:
+        return -1
+    if TERMINAL_TABLE[code] or depth == 0:
+        return 0
+
+    legal_actions = empty_cells(code)
+
+    # Searching past the last empty cell gives the same result
+    depth = min(depth, len(legal_actions))
+    cached, best = tt_lookup(code, depth, alpha, beta)
+    if cached is not None:
+        return cached
+
+    alpha_orig = alpha
+    v = - math.inf
+    for i in ordered_actions(legal_actions, best):
+        child_v = - negamax(code + piece * POW3[i], 3 - piece, - beta, - alpha, depth - 1)
+        if child_v > v:
+            best = i
+            v = child_v
+        if v >= beta:
+            break
+        alpha = max(alpha, v)
+
+    tt_store(code, depth, alpha_orig, beta, v, best)
+    return v
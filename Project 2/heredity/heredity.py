@@ -2,6 +2,8 @@ import csv
 import itertools
 import sys
 
+import numpy as np
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,6 +38,34 @@ PROBS = {
     "mutation": 0.01
 }
 
+# INHERIT[num_of_genes][is_inherited]: probability that a parent with
+# `num_of_genes` copies passes the gene on (True) or not (False)
+INHERIT = (
+    (1 - PROBS["mutation"], PROBS["mutation"]),
+    (0.5, 0.5),
+    (PROBS["mutation"], 1 - PROBS["mutation"])
+)
+
+# TRAIT[num_of_genes][has_trait], same values as PROBS["trait"]
+TRAIT = tuple(
+    (PROBS["trait"][n][False], PROBS["trait"][n][True])
+    for n in range(3)
+)
+
+# CHILD[num_of_genes_mother][num_of_genes_father][num_of_genes]: probability
+# that a child of such parents has `num_of_genes` copies of the gene
+CHILD = tuple(
+    tuple(
+        (
+            INHERIT[m][False] * INHERIT[f][False],
+            INHERIT[m][False] * INHERIT[f][True] + INHERIT[m][True] * INHERIT[f][False],
+            INHERIT[m][True] * INHERIT[f][True]
+        )
+        for f in range(3)
+    )
+    for m in range(3)
+)
+
 
 def main():
 
@@ -44,54 +74,35 @@ def main():
         sys.exit("Usage: python heredity.py data.csv")
     people = load_data(sys.argv[1])
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
-        person: {
-            "gene": {
-                2: 0,
-                1: 0,
-                0: 0
-            },
-            "trait": {
-                True: 0,
-                False: 0
-            }
-        }
-        for person in people
+    # Keep track of gene and trait probabilities for each person: row
+    # rows[person] of "gene" is indexed by number of genes, and of "trait"
+    # by whether they have the trait. Sums are accumulated in plain lists,
+    # which are much cheaper than NumPy scalar updates in the innermost loop.
+    rows = {person: i for i, person in enumerate(people)}
+    sums = {
+        "gene": [[0.0, 0.0, 0.0] for person in people],
+        "trait": [[0.0, 0.0] for person in people]
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    # Sum joint probabilities over every assignment of gene counts,
+    # assigning parents before their children
+    enumerate_genes(people, parents_first(people), rows, sums, 0, 0, 0, 1)
 
     # Ensure probabilities sum to 1
+    probabilities = {field: np.array(sums[field]) for field in sums}
     normalize(probabilities)
 
     # Print results
     for person in people:
         print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+        print("  Gene:")
+        for num_of_genes in (2, 1, 0):
+            p = probabilities["gene"][rows[person], num_of_genes]
+            print(f"    {num_of_genes}: {p:.4f}")
+        print("  Trait:")
+        for has_trait in (True, False):
+            p = probabilities["trait"][rows[person], int(has_trait)]
+            print(f"    {has_trait}: {p:.4f}")
 
 
 def load_data(filename):
@@ -118,13 +129,12 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Return a list of all possible subsets of set s, as frozensets.
     """
     s = list(s)
     return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
+        frozenset(c) for r in range(len(s) + 1)
+        for c in itertools.combinations(s, r)
     ]
 
 
@@ -137,19 +147,6 @@ def person_num_of_genes(person, one_gene, two_genes):
         return 0
 
 
-def parent_inherit_process(num_of_genes, is_inherited):
-    if num_of_genes == 0:
-        return PROBS['mutation'] if is_inherited else 1 - PROBS['mutation']
-
-    elif num_of_genes == 1:
-        return 0.5
-
-    elif num_of_genes == 2:
-        return 1 - PROBS['mutation'] if is_inherited else PROBS['mutation']
-
-
-
-
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -160,50 +157,160 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
+
+    Returns the pair (probability, gene_counts), where gene_counts is an
+    array of everyone's number of genes in the order of `people`.
     """
+    gene_counts = {
+        person: person_num_of_genes(person, one_gene, two_genes)
+        for person in people
+    }
+    gene_counts_array = np.fromiter(gene_counts.values(), dtype=np.int64, count=len(people))
     probability = 1
 
     for person in people:
-        num_of_genes_person = person_num_of_genes(person, one_gene, two_genes)
+        num_of_genes_person = gene_counts[person]
         has_trait = person in have_trait
 
         mother = people[person]['mother']
         father = people[person]['father']
 
         if mother is None and father is None:
-            probability *= PROBS['gene'][num_of_genes_person] * PROBS['trait'][num_of_genes_person][has_trait]
-        
-        else:
-            num_of_genes_mother = person_num_of_genes(mother, one_gene, two_genes)
-            num_of_genes_father = person_num_of_genes(father, one_gene, two_genes)
-            
-            if num_of_genes_person == 0:
-                probability *= parent_inherit_process(num_of_genes_mother, False) * parent_inherit_process(num_of_genes_father, False)
-
-            elif num_of_genes_person == 1:
-                probability *= (parent_inherit_process(num_of_genes_mother, False) * parent_inherit_process(num_of_genes_father, True) + parent_inherit_process(num_of_genes_mother, True) * parent_inherit_process(num_of_genes_father, False))
+            factor = PROBS['gene'][num_of_genes_person] * TRAIT[num_of_genes_person][has_trait]
 
-            elif num_of_genes_person == 2:
-                probability *= parent_inherit_process(num_of_genes_mother, True) * parent_inherit_process(num_of_genes_father, True)
+        else:
+            # A parent who is blank or not in `people` has no copies of the gene
+            num_of_genes_mother = gene_counts.get(mother, 0)
+            num_of_genes_father = gene_counts.get(father, 0)
+            factor = CHILD[num_of_genes_mother][num_of_genes_father][num_of_genes_person] * TRAIT[num_of_genes_person][has_trait]
 
-            probability *= PROBS["trait"][num_of_genes_person][has_trait]
+        probability *= factor
+        if probability == 0:
+            return 0.0, gene_counts_array
 
-    return probability
+    return probability, gene_counts_array
 
 
-def update(probabilities, one_gene, two_genes, have_trait, p):
+def update(probabilities, rows, gene_counts, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
     Each person should have their "gene" and "trait" distributions updated.
-    Which value for each distribution is updated depends on whether
-    the person is in `have_gene` and `have_trait`, respectively.
+    Which value for each distribution is updated depends on
+    the person's number of genes in `gene_counts` (as returned by
+    `joint_probability`) and whether they are in `have_trait`.
+    `rows` maps each person to their row in the distributions, in the
+    same order as `gene_counts`.
     """
-    for person in probabilities:
-        num_of_genes = person_num_of_genes(person, one_gene, two_genes)
-        has_trait = person in have_trait
-        
-        probabilities[person]['gene'][num_of_genes] += p
-        probabilities[person]['trait'][has_trait] += p
+    if p == 0:
+        return
+
+    index = list(rows.values())
+    probabilities["gene"][index, gene_counts] += p
+    probabilities["trait"][index, [int(person in have_trait) for person in rows]] += p
+
+
+def parents_first(people):
+    """
+    Return a list of the names in `people`, ordered so that everyone
+    comes after their mother and father.
+    A parent who is blank or not in `people` does not need to be placed.
+    """
+    order = []
+    placed = set()
+    while len(order) < len(people):
+        placed_before = len(order)
+        for person in people:
+            if person in placed:
+                continue
+            parents = (people[person]["mother"], people[person]["father"])
+            if all(parent not in people or parent in placed for parent in parents):
+                order.append(person)
+                placed.add(person)
+
+        if len(order) == placed_before:
+            raise ValueError("people cannot be ordered parents first (cycle in parents)")
+    return order
+
+
+def bit_num_of_genes(i, one_gene, two_genes):
+    """
+    Return the number of genes of the person with bit `i`, where
+    `one_gene` and `two_genes` are bitmasks of people.
+    """
+    return ((two_genes >> i) & 1) * 2 + ((one_gene >> i) & 1)
+
+
+def parent_num_of_genes(parent, rows, one_gene, two_genes):
+    """
+    Return the number of genes of `parent` in the bitmasks, where a parent
+    who is blank or not in `rows` counts as having no copies of the gene.
+    """
+    if parent not in rows:
+        return 0
+    return bit_num_of_genes(rows[parent], one_gene, two_genes)
+
+
+def enumerate_genes(people, order, rows, sums, k, one_gene, two_genes, p):
+    """
+    Add to `sums` the joint probability of every assignment of
+    gene counts to the people in `order` that extends the assignment of
+    the first `k` of them.
+    `sums` has the layout of `probabilities`, but with lists of rows
+    rather than arrays. `rows` maps each person to their row, which is
+    also their bit in the `one_gene` and `two_genes` bitmasks.
+
+    `p` is the probability of the partial assignment together with the
+    known traits of those people. Traits that are not known are summed
+    out rather than enumerated.
+    """
+    if k == len(order):
+        for person in order:
+            i = rows[person]
+
+            # bit_num_of_genes, inlined: this runs once per person per leaf
+            num_of_genes = ((two_genes >> i) & 1) * 2 + ((one_gene >> i) & 1)
+            trait = people[person]["trait"]
+
+            sums["gene"][i][num_of_genes] += p
+            trait_sums = sums["trait"][i]
+            if trait is None:
+                trait_sums[False] += p * TRAIT[num_of_genes][False]
+                trait_sums[True] += p * TRAIT[num_of_genes][True]
+            else:
+                trait_sums[trait] += p
+        return
+
+    person = order[k]
+    i = rows[person]
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+
+    has_parents = mother is not None or father is not None
+    if has_parents:
+        num_of_genes_mother = parent_num_of_genes(mother, rows, one_gene, two_genes)
+        num_of_genes_father = parent_num_of_genes(father, rows, one_gene, two_genes)
+        child_genes = CHILD[num_of_genes_mother][num_of_genes_father]
+
+    for num_of_genes in range(3):
+        if not has_parents:
+            gene_probability = PROBS["gene"][num_of_genes]
+        else:
+            gene_probability = child_genes[num_of_genes]
+
+        if trait is not None:
+            gene_probability *= TRAIT[num_of_genes][trait]
+
+        # Nothing that extends an impossible assignment can contribute
+        if gene_probability == 0:
+            continue
+
+        enumerate_genes(
+            people, order, rows, sums, k + 1,
+            one_gene | (num_of_genes == 1) << i,
+            two_genes | (num_of_genes == 2) << i,
+            p * gene_probability
+        )
 
 
 def normalize(probabilities):
@@ -211,23 +318,8 @@ def normalize(probabilities):
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
     """
-    for person in probabilities:
-        gene_probabilities_sum = 0
-        trait_probabilities_sum = 0
-
-        for num_of_genes in range(3):
-            gene_probabilities_sum += probabilities[person]['gene'][num_of_genes]
-        gene_factor = 1 / gene_probabilities_sum
-        for num_of_genes in range(3):
-            probabilities[person]['gene'][num_of_genes] = gene_factor * probabilities[person]['gene'][num_of_genes]
-        
-        
-        trait_probabilities_sum += probabilities[person]['trait'][True]
-        trait_probabilities_sum += probabilities[person]['trait'][False]
-        trait_factor = 1 / trait_probabilities_sum
-        
-        probabilities[person]['trait'][True] = trait_factor * probabilities[person]['trait'][True]
-        probabilities[person]['trait'][False] = trait_factor * probabilities[person]['trait'][False]
+    for field in probabilities:
+        probabilities[field] /= probabilities[field].sum(axis=1, keepdims=True)
 
 
 if __name__ == "__main__":
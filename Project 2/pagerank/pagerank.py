@@ -1,11 +1,23 @@
 import os
 import random
-import re
 import sys
 
+import numpy as np
+import scipy.sparse
+
+# Scan links with RE2 (linear-time DFA matching, `pip install google-re2`)
+# when it is available, otherwise with the standard backtracking engine
+try:
+    import re2 as re
+except ImportError:
+    import re
+
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Matches the href of every <a> tag, on the raw bytes of an HTML file
+LINK_RE = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
 
 def main():
     if len(sys.argv) != 2:
@@ -33,10 +45,10 @@ def crawl(directory):
     for filename in os.listdir(directory):
         if not filename.endswith(".html"):
             continue
-        with open(os.path.join(directory, filename)) as f:
+        with open(os.path.join(directory, filename), "rb") as f:
             contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+            links = {link.decode() for link in LINK_RE.findall(contents)}
+            pages[filename] = links - {filename}
 
     # Only include links to other pages in the corpus
     for filename in pages:
@@ -88,18 +100,28 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    pages = corpus.keys()
-    result_dict = {}
-    init_page = random.choice(list(pages))
-    result_dict[init_page] = 1 / n
+    pages = list(corpus)
+    num_of_pages = len(pages)
+
+    # Cumulative transition probabilities for every page, computed once
+    # (transition_model lists destination pages in corpus order)
+    cumulative = np.array([
+        list(transition_model(corpus, page, damping_factor).values())
+        for page in pages
+    ]).cumsum(axis=1)
+    cumulative[:, -1] = 1
+
+    # The start page and every step come from `random`, so random.seed()
+    # makes the sampling reproducible
+    visits = np.zeros(num_of_pages, dtype=np.int64)
+    cur_page = random.randrange(num_of_pages)
+    visits[cur_page] += 1
 
-    cur_page = init_page
     for i in range(n - 1):
-        trans = transition_model(corpus, cur_page, damping_factor)
-        cur_page = random.choices(list(trans.keys()), list(trans.values()))[0]
-        result_dict[cur_page] = result_dict.get(cur_page, 0) + (1 / n)
-    
-    return result_dict
+        cur_page = int(np.searchsorted(cumulative[cur_page], random.random(), side="right"))
+        visits[cur_page] += 1
+
+    return dict(zip(pages, (visits / n).tolist()))
 
 
 
@@ -112,38 +134,45 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    num_of_pages = len(corpus)
-    pre_result_dict = {}
+    pages = list(corpus)
+    num_of_pages = len(pages)
     margin = 0.001
 
-    for page in corpus:
-        pre_result_dict[page] = 1 / num_of_pages
-    
-    cur_result_dict = pre_result_dict.copy()
+    # Sparse link matrix: entry (src, dest) is the probability of following
+    # the link from src to dest. Pages with no links are kept out of it and
+    # instead spread their rank evenly over every page on each iteration.
+    index = {page: i for i, page in enumerate(pages)}
+    rows = []
+    cols = []
+    data = []
+    for src_page in pages:
+        for dest_page in corpus[src_page]:
+            rows.append(index[src_page])
+            cols.append(index[dest_page])
+            data.append(1 / len(corpus[src_page]))
+    links_in = scipy.sparse.csr_matrix(
+        (data, (rows, cols)), shape=(num_of_pages, num_of_pages)
+    ).T.tocsr()
+    dangling = np.array([1.0 if len(corpus[page]) == 0 else 0.0 for page in pages])
+
+    # Two rank vectors, swapped after each iteration
+    ranks = np.full(num_of_pages, 1 / num_of_pages)
+    new_ranks = np.empty(num_of_pages)
+    diff = np.empty(num_of_pages)
+    teleport = (1 - damping_factor) / num_of_pages
 
     while True:
-        num_converged = 0
-        for dest_page in corpus:
-            updated_value = 0
-
-            for src_page in corpus:
-                if dest_page in corpus[src_page]:
-                    updated_value += (pre_result_dict[src_page] / len(corpus[src_page]))
-                elif len(corpus[src_page]) == 0:
-                    updated_value += (pre_result_dict[src_page] / num_of_pages)
-
-            updated_value *= damping_factor
-            updated_value += (1 - damping_factor) / num_of_pages
-            cur_result_dict[dest_page] = updated_value
-
-            if abs(updated_value - pre_result_dict[dest_page]) < margin:
-                num_converged += 1
-            
-        if num_converged == num_of_pages:
+        dangling_share = dangling.dot(ranks) / num_of_pages
+        np.multiply(links_in @ ranks + dangling_share, damping_factor, out=new_ranks)
+        new_ranks += teleport
+
+        np.subtract(new_ranks, ranks, out=diff)
+        np.abs(diff, out=diff)
+        ranks, new_ranks = new_ranks, ranks
+        if diff.max() < margin:
             break
-        pre_result_dict = cur_result_dict.copy()
-    
-    return pre_result_dict
+
+    return dict(zip(pages, ranks.tolist()))
 
 
 